@@ -0,0 +1,303 @@
+"""
+An ndarray-backed image buffer for the pictool.
+
+This module provides ImageBuffer, a faster alternative to the 2d table of RGB
+objects used by the original pictool.  Instead of one Python object per pixel,
+an ImageBuffer stores all of the pixels in a single numpy array of shape
+(height, width, 4).  Each channel is laid out contiguously in memory, so the
+plugin commands can process whole channels with a handful of numpy operations
+instead of millions of attribute lookups.
+
+An ImageBuffer still looks like a 2d table from the outside.  Indexing it
+returns a row proxy, and indexing the row returns a pixel proxy with the same
+red, green, blue, and alpha attributes as an RGB object.  That means plugin
+functions written against the table-of-RGB format keep working unchanged.
+Plugins that want the fast path can detect the array backend by checking for
+the _arr attribute and operate on the array directly.
+
+This module requires numpy.  The application falls back to the table-of-RGB
+format when numpy is not installed.
+
+When cupy is installed (and a CUDA device is present), the pixel array lives
+on the GPU instead.  The buffer records which array module backs it in the
+_xp attribute, so plugins can run the same channel operations on either
+library.  Pixels stay resident on the device across chained commands and are
+only copied back when rgba_array is called for output.
+
+Author: Aidan Cheney-Lynch
+Date: 08/30/26
+"""
+import numpy as np
+
+# cupy is optional; without it the buffer stays in main memory
+try:
+    import cupy as cp
+    cp.cuda.runtime.getDeviceCount()
+except Exception:
+    cp = None
+
+
+class _Pixel(object):
+    """
+    A proxy for one pixel of an ImageBuffer.
+
+    The proxy reads and writes the underlying array in place, so it supports
+    the same attributes as an RGB object without copying any data.
+    """
+
+    @property
+    def red(self):
+        """
+        The red channel of this pixel.
+
+        Invariant: red is an int in 0..255
+        """
+        return int(self._buffer._arr[self._row, self._col, 0])
+
+    @red.setter
+    def red(self, value):
+        assert type(value) == int and 0 <= value <= 255
+        self._buffer._arr[self._row, self._col, 0] = value
+
+    @property
+    def green(self):
+        """
+        The green channel of this pixel.
+
+        Invariant: green is an int in 0..255
+        """
+        return int(self._buffer._arr[self._row, self._col, 1])
+
+    @green.setter
+    def green(self, value):
+        assert type(value) == int and 0 <= value <= 255
+        self._buffer._arr[self._row, self._col, 1] = value
+
+    @property
+    def blue(self):
+        """
+        The blue channel of this pixel.
+
+        Invariant: blue is an int in 0..255
+        """
+        return int(self._buffer._arr[self._row, self._col, 2])
+
+    @blue.setter
+    def blue(self, value):
+        assert type(value) == int and 0 <= value <= 255
+        self._buffer._arr[self._row, self._col, 2] = value
+
+    @property
+    def alpha(self):
+        """
+        The alpha channel of this pixel.
+
+        Invariant: alpha is an int in 0..255
+        """
+        return int(self._buffer._arr[self._row, self._col, 3])
+
+    @alpha.setter
+    def alpha(self, value):
+        assert type(value) == int and 0 <= value <= 255
+        self._buffer._arr[self._row, self._col, 3] = value
+
+    def __init__(self, buffer, row, col):
+        """
+        Initializes a proxy for the pixel at (row, col) of buffer.
+
+        Parameter buffer: The image buffer that owns this pixel
+        Precondition: buffer is an ImageBuffer
+
+        Parameter row: The pixel row
+        Precondition: row is an int and a valid row of buffer
+
+        Parameter col: The pixel column
+        Precondition: col is an int and a valid column of buffer
+        """
+        self._buffer = buffer
+        self._row = row
+        self._col = col
+
+    def rgba(self):
+        """
+        Returns the pixel as an (red, green, blue, alpha) tuple of ints.
+        """
+        return (self.red, self.green, self.blue, self.alpha)
+
+    def __repr__(self):
+        """
+        Returns the representation of this pixel, matching the RGB format.
+        """
+        return '(red=%d,green=%d,blue=%d,alpha=%d)' % self.rgba()
+
+    def __eq__(self, other):
+        """
+        Returns True if other is a pixel with the same channel values.
+        """
+        return (hasattr(other, 'rgba') and self.rgba() == other.rgba())
+
+
+class _Row(object):
+    """
+    A proxy for one row of an ImageBuffer.
+
+    The proxy is a lightweight sequence of pixel proxies.  It always looks up
+    the current array on the buffer, so it remains valid even after a plugin
+    replaces the backing array (e.g. after a transpose).
+    """
+
+    def __init__(self, buffer, row):
+        """
+        Initializes a proxy for the given row of buffer.
+
+        Parameter buffer: The image buffer that owns this row
+        Precondition: buffer is an ImageBuffer
+
+        Parameter row: The row position
+        Precondition: row is an int and a valid row of buffer
+        """
+        self._buffer = buffer
+        self._row = row
+
+    def __len__(self):
+        """
+        Returns the number of pixels in this row.
+        """
+        return self._buffer._arr.shape[1]
+
+    def __getitem__(self, col):
+        """
+        Returns a pixel proxy for the given column.
+
+        Parameter col: The pixel column
+        Precondition: col is an int and a valid column of this row
+        """
+        return _Pixel(self._buffer, self._row, col)
+
+    def __iter__(self):
+        """
+        Returns an iterator over the pixel proxies of this row.
+        """
+        for col in range(len(self)):
+            yield _Pixel(self._buffer, self._row, col)
+
+
+class ImageBuffer(object):
+    """
+    An image buffer backed by a single numpy array.
+
+    The pixels are stored as a (height, width, 4) array of uint8 values, with
+    the channels in RGBA order.  Plugins can detect this backend by checking
+    for the _arr attribute and manipulate the array directly; everything else
+    can index the buffer like a 2d table of RGB objects.
+    """
+
+    def __init__(self, data):
+        """
+        Initializes an image buffer from the given pixel data.
+
+        Parameter data: The pixel data
+        Precondition: data is anything numpy can convert to a (height, width, 4)
+        array of uint8 values (e.g. an RGBA PIL image or a nested sequence)
+        """
+        arr = np.array(data, dtype=np.uint8)
+        assert arr.ndim == 3 and arr.shape[2] == 4, 'data is not RGBA pixel data'
+        if cp is not None:
+            # Upload once; all later commands run on the device
+            self._arr = cp.asarray(arr)
+            self._xp  = cp
+        else:
+            self._arr = arr
+            self._xp  = np
+
+        # Pending orientation as (transposed, flip_v, flip_h).  Flips and
+        # transposes only update this descriptor; the pixels are rearranged
+        # once, on the next access, by materialize().
+        self._orient = [False, False, False]
+
+    def flip(self, vertical):
+        """
+        Records a flip of this image in the orientation descriptor.
+
+        This is O(1); no pixels move until the image is next accessed.
+
+        Parameter vertical: Whether to flip vertically instead of horizontally
+        Precondition: vertical is a bool
+        """
+        if vertical:
+            self._orient[1] = not self._orient[1]
+        else:
+            self._orient[2] = not self._orient[2]
+
+    def transpose(self):
+        """
+        Records a transpose of this image in the orientation descriptor.
+
+        This is O(1); no pixels move until the image is next accessed.
+        Transposing swaps the roles of any pending flips, since reversing a
+        row before the transpose is reversing a column after it.
+        """
+        self._orient[0] = not self._orient[0]
+        self._orient[1], self._orient[2] = self._orient[2], self._orient[1]
+
+    def materialize(self):
+        """
+        Applies any pending orientation to the pixel array.
+
+        Successive flips, transposes, and rotates collapse into at most one
+        axis swap and two axis reversals, followed by a single contiguous
+        copy.  This is a no-op when no orientation is pending.
+        """
+        transposed, flip_v, flip_h = self._orient
+        if not (transposed or flip_v or flip_h):
+            return
+
+        arr = self._arr
+        if transposed:
+            arr = arr.swapaxes(0, 1)
+        if flip_v:
+            arr = arr[::-1]
+        if flip_h:
+            arr = arr[:, ::-1]
+
+        self._arr = self._xp.ascontiguousarray(arr)
+        self._orient = [False, False, False]
+
+    def __len__(self):
+        """
+        Returns the number of rows in this image.
+        """
+        self.materialize()
+        return self._arr.shape[0]
+
+    def __getitem__(self, row):
+        """
+        Returns a row proxy for the given row.
+
+        Parameter row: The row position
+        Precondition: row is an int and a valid row of this image
+        """
+        self.materialize()
+        return _Row(self, row)
+
+    def __iter__(self):
+        """
+        Returns an iterator over the row proxies of this image.
+        """
+        for row in range(len(self)):
+            yield _Row(self, row)
+
+    def rgba_array(self):
+        """
+        Returns the pixels as a contiguous (height, width, 4) uint8 array.
+
+        Plugins may leave the backing array as a strided view (e.g. after a
+        flip).  This method materializes it so that consumers like the file
+        writer get contiguous memory.  On the cupy backend the pixels are
+        copied back from the device; the resident copy stays on the GPU.
+        """
+        self.materialize()
+        self._arr = self._xp.ascontiguousarray(self._arr)
+        if self._xp is not np:
+            return cp.asnumpy(self._arr)
+        return self._arr
@@ -28,11 +28,26 @@ Date: August 11, 2019
 """
 from PIL import Image as CoreImage
 import traceback
-import introcs
 import os.path
 import plugins
 import sys
 
+# introcs is only needed to recognize its RGB objects in legacy 2d tables
+try:
+    import introcs
+except ImportError:
+    introcs = None
+
+# The array-backed buffer needs numpy.  When numpy is missing we fall back to
+# the original (much slower) 2d table of RGB objects.
+try:
+    from imagebuffer import ImageBuffer
+except ImportError:
+    ImageBuffer = None
+
+# The packed-byte buffer only needs the standard library
+from rawbuffer import RawImageBuffer, RGB
+
 
 # The number of periods in the "progress bar"
 PROGRESS = 10
@@ -64,29 +79,15 @@ def read_image(file):
         width  = image.size[0]
         height = image.size[1]
 
-        # Poor man's progress bar
-        size = width*height
-        block = max(size//PROGRESS,1)
-
-        # This is an iterator.  It allows us to "sync" two sequences in the loop
-        source = iter(image.getdata())
-
-        # Convert PIL data to student-friendly format
-        buffer = []
-        for r in range(height):
-            row = []
-            for c in range(width):
-                # Get next PIL pixel and convert to RGB object
-                tups = next(source)
-                row.append(introcs.RGB(*tups))
-
-                # Update progress bar every block steps
-                if (r*width+c) % block == 0:
-                    print('.',end='',flush=True)
-
-            buffer.append(row)
+        # Fast path: copy the PIL pixels into an array-backed buffer at once
+        if ImageBuffer is not None:
+            buffer = ImageBuffer(image)
+            print(('.'*PROGRESS)+'done')
+            return buffer
 
-        print('done')
+        # Fallback: pack the PIL pixels into bytearray rows
+        buffer = RawImageBuffer(image.getdata(), width)
+        print(('.'*PROGRESS)+'done')
         return buffer
     except:
         # This displays error message even though we are not technically crashing
@@ -104,6 +105,17 @@ def verify_image(buffer):
 
     Parameter buffer: the candidate image buffer
     """
+    # An array-backed buffer maintains its format as a class invariant
+    if ImageBuffer is not None and isinstance(buffer, ImageBuffer):
+        return len(buffer) > 0 and len(buffer[0]) > 0
+
+    # A packed-byte buffer just needs its rows to agree on the width
+    if isinstance(buffer, RawImageBuffer):
+        if len(buffer) == 0 or len(buffer[0]) == 0:
+            return False
+        stride = len(buffer._rows[0])
+        return all(len(row) == stride for row in buffer._rows)
+
     if type(buffer) != list or len(buffer) == 0:
         return False
 
@@ -116,7 +128,7 @@ def verify_image(buffer):
         if len(row) != width:
             return False
         for item in row:
-            if type(item) != introcs.RGB:
+            if type(item) != RGB and (introcs is None or type(item) != introcs.RGB):
                 return False
 
     return True
@@ -140,6 +152,14 @@ def save_image(buffer,file):
     # Make sure the student did not damage anything
     assert verify_image(buffer), 'A plug-in has corrupted the image data'
     try:
+        # Fast path: hand the pixel array to PIL in one call
+        if ImageBuffer is not None and isinstance(buffer, ImageBuffer):
+            print(('Saving ' + repr(file)),end='',flush=True)
+            im = CoreImage.fromarray(buffer.rgba_array(), 'RGBA')
+            im.save(file,'PNG')
+            print(('.'*PROGRESS)+'done')
+            return
+
         height = len(buffer)
         width  = len(buffer[0])
 
@@ -17,6 +17,130 @@ any parameter after images.  Otherwise, command line typos may be hard to debug.
 Author: Aidan Cheney-Lynch
 Date: 05/11/22
 """
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
+
+# numpy is optional.  When it is present the commands below use vectorized
+# implementations that are much faster on large images.  When it is missing
+# they fall back to the original per-pixel loops.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# numba is optional as well.  When it is present the mono command compiles its
+# inner loop to machine code and splits the rows across all processor cores.
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+# Fixed-point brightness tables for mono.  The weights 0.3, 0.6, 0.1 are
+# scaled by 1024 (307, 614, 103), so the brightness of a pixel is
+#
+#     (_LUT_RED[r] + _LUT_GREEN[g] + _LUT_BLUE[b]) >> 10
+#
+# using only integer loads, adds, and one shift.  The sepia tables scale a
+# brightness value by 0.6 and 0.4 the same way.
+_LUT_RED   = [r*307 for r in range(256)]
+_LUT_GREEN = [g*614 for g in range(256)]
+_LUT_BLUE  = [b*103 for b in range(256)]
+_LUT_SEPIA_GREEN = [(x*614) >> 10 for x in range(256)]
+_LUT_SEPIA_BLUE  = [(x*410) >> 10 for x in range(256)]
+
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True, error_model='numpy')
+    def _mono_kernel(red, green, blue, sepia):
+        """
+        Applies the mono transform in place to three contiguous channel arrays.
+
+        The rows are split across cores with prange, and the compiler is free
+        to vectorize the brightness arithmetic within each row.
+
+        Parameter red: The red channel values (modified in place)
+        Precondition: red is a 2d numpy array of uint8 values
+
+        Parameter green: The green channel values (modified in place)
+        Precondition: green is a 2d numpy array of uint8 values
+
+        Parameter blue: The blue channel values (modified in place)
+        Precondition: blue is a 2d numpy array of uint8 values
+
+        Parameter sepia: Whether to use sepia tone instead of greyscale
+        Precondition: sepia is a bool
+        """
+        height, width = red.shape
+        for i in prange(height):
+            for j in range(width):
+                # Same fixed-point weights as the brightness tables
+                br = (np.int32(red[i, j])*307 + np.int32(green[i, j])*614 +
+                      np.int32(blue[i, j])*103) >> 10
+                red[i, j] = np.uint8(br)
+                if sepia:
+                    green[i, j] = np.uint8((br*614) >> 10)
+                    blue[i, j]  = np.uint8((br*410) >> 10)
+                else:
+                    green[i, j] = np.uint8(br)
+                    blue[i, j]  = np.uint8(br)
+else:
+    _mono_kernel = None
+
+
+def _to_ndarray(image):
+    """
+    Returns the image pixels as an H x W x 3 numpy array of uint8 values.
+
+    The array holds the red, green, and blue channels of every pixel.  It is a
+    copy of the pixel data, not a view, so changes to the array do not affect
+    the image until they are written back with _from_ndarray.
+
+    Parameter image: The image buffer
+    Precondition: image is a 2d table of RGB objects
+    """
+    height = len(image)
+    width  = len(image[0])
+
+    arr = np.empty((height, width, 3), dtype=np.uint8)
+    for row in range(height):
+        line = image[row]
+        for col in range(width):
+            pixel = line[col]
+            arr[row, col, 0] = pixel.red
+            arr[row, col, 1] = pixel.green
+            arr[row, col, 2] = pixel.blue
+
+    return arr
+
+
+def _from_ndarray(image, arr):
+    """
+    Copies the channel values in arr back into the RGB objects of image.
+
+    This is the inverse of _to_ndarray.  The alpha values of the pixels are
+    left untouched.
+
+    Parameter image: The image buffer
+    Precondition: image is a 2d table of RGB objects
+
+    Parameter arr: The channel values to copy back
+    Precondition: arr is an H x W x 3 numpy array of uint8 values
+    """
+    height = len(image)
+    width  = len(image[0])
+
+    for row in range(height):
+        line = image[row]
+        for col in range(width):
+            pixel = line[col]
+            pixel.red   = int(arr[row, col, 0])
+            pixel.green = int(arr[row, col, 1])
+            pixel.blue  = int(arr[row, col, 2])
 
 
 # Function useful for debugging
@@ -37,22 +161,22 @@ def display(image):
     height = len(image)
     width  = len(image[0])
 
+    # Represent every pixel once; the padding scan reuses these strings
+    # instead of calling repr on every pixel a second time.  map keeps the
+    # repr calls in C instead of a Python-level loop per pixel.
+    reprs = [list(map(repr, row)) for row in image]
+
     # Find the maximum string size for padding
-    maxsize = 0
-    for row in image:
-        for pixel in row:
-            text = repr(pixel)
-            if len(text) > maxsize:
-                maxsize = len(text)
+    maxsize = max(max(map(len, row)) for row in reprs)
 
-    # Pretty print the pixels
-    print()
+    # Pretty print the pixels.  The output is assembled in a string buffer
+    # and written in one call, instead of one print per pixel.
+    buffer = io.StringIO()
+    buffer.write('\n')
     for pos1 in range(height):
-        row = image[pos1]
+        row = reprs[pos1]
         for pos2 in range(width):
-            pixel = row[pos2]
-
-            middle = repr(pixel)
+            middle = row[pos2]
             padding = maxsize-len(middle)
 
             prefix = '      '
@@ -67,7 +191,12 @@ def display(image):
             elif pos2 == width-1:
                 suffix = (' '*padding)+' ],'
 
-            print(prefix+middle+suffix)
+            buffer.write(prefix)
+            buffer.write(middle)
+            buffer.write(suffix)
+            buffer.write('\n')
+
+    sys.stdout.write(buffer.getvalue())
 
     # This function does not modify the image
     return
@@ -85,18 +214,147 @@ def dered(image):
     Parameter image: The image buffer
     Precondition: image is a 2d table of RGB objects
     """
-    # Get the image size
-    height = len(image)
-    width  = len(image[0])
-
-    for row in range(height):
-        for col in range(width):
-            pixel = image[row][col]
+    # Array backend: zero the whole red plane in one store.  The transform
+    # is per-pixel, so it commutes with any pending orientation.
+    if hasattr(image, '_arr'):
+        image._arr[..., 0] = 0
+        return True
+
+    # Packed-byte backend: zero every fourth byte with one strided store per row
+    if hasattr(image, '_rows'):
+        for row in image._rows:
+            row[0::4] = bytes(len(row)//4)
+        return True
+
+    # Iterate the rows directly to avoid the double index on every pixel
+    for row in image:
+        for pixel in row:
             pixel.red = 0
 
     # This function DOES modify the image
     return True
 
+# Images below this many pixels are not worth a thread pool
+_PARALLEL_THRESHOLD = 1000000
+
+
+def _mono_stripe(arr, sepia):
+    """
+    Applies the mono transform in place to a stripe of pixel rows.
+
+    This is the widening multiply-add from the array path of mono, split out
+    so that mono can run it on independent row stripes from a thread pool.
+    numpy releases the GIL inside the array operations, so the stripes
+    really do run in parallel.
+
+    Parameter arr: The stripe pixels (modified in place)
+    Precondition: arr is a numpy (or compatible) array of uint8 values with
+    shape (rows, width, 4), or a view of one
+
+    Parameter sepia: Whether to use sepia tone instead of greyscale
+    Precondition: sepia is a bool
+    """
+    channels = arr[..., :3].astype('int32')
+    brightness = (channels[..., 0]*307 + channels[..., 1]*614 +
+                  channels[..., 2]*103) >> 10
+
+    arr[..., 0] = brightness
+    if sepia:
+        arr[..., 1] = (brightness*614) >> 10
+        arr[..., 2] = (brightness*410) >> 10
+    else:
+        arr[..., 1] = arr[..., 0]
+        arr[..., 2] = arr[..., 0]
+
+
+# Reads all three color channels of a pixel with one C-level call, instead
+# of three LOAD_ATTR lookups in the loop body
+_rgb = attrgetter('red', 'green', 'blue')
+
+# Cache of lane masks for _mono_swar, keyed by row length in bytes
+_SWAR_MASKS = {}
+
+def _mono_swar(row, sepia):
+    """
+    Applies the mono transform in place to one packed RGBA bytearray row.
+
+    The whole row is loaded as a single big integer so every pixel occupies
+    its own 32-bit lane.  The fixed-point brightness (weights 307, 614, 103,
+    shift 10 -- the same arithmetic as the lookup tables) is then computed
+    for all lanes at once with a few big-integer multiplies, adds, and
+    shifts, instead of one Python loop iteration per pixel.  The products
+    never exceed 18 bits, so lanes cannot overflow into each other.
+
+    Parameter row: The row pixels (modified in place)
+    Precondition: row is a bytearray of interleaved RGBA bytes
+
+    Parameter sepia: Whether to use sepia tone instead of greyscale
+    Precondition: sepia is a bool
+    """
+    masks = _SWAR_MASKS.get(len(row))
+    if masks is None:
+        lane = int.from_bytes(b'\xff\x00\x00\x00'*(len(row)//4), 'little')
+        masks = (lane, lane << 24)
+        _SWAR_MASKS[len(row)] = masks
+    lane, alpha = masks
+
+    q = int.from_bytes(row, 'little')
+    red   = q & lane
+    green = (q >> 8) & lane
+    blue  = (q >> 16) & lane
+
+    brightness = ((red*307 + green*614 + blue*103) >> 10) & lane
+    if sepia:
+        out = (brightness |
+               ((((brightness*614) >> 10) & lane) << 8) |
+               ((((brightness*410) >> 10) & lane) << 16) |
+               (q & alpha))
+    else:
+        out = brightness | (brightness << 8) | (brightness << 16) | (q & alpha)
+
+    row[:] = out.to_bytes(len(row), 'little')
+
+
+def _mono_grey(image):
+    """
+    Converts a table-backend image to greyscale in place.
+
+    This is the specialized loop body for mono with sepia False, so the hot
+    loop carries no per-pixel branch on the mode.
+
+    Parameter image: The image buffer
+    Precondition: image is a 2d table of RGB objects
+    """
+    for row in image:
+        for pixel in row:
+            red, green, blue = _rgb(pixel)
+            brightness = (_LUT_RED[red] + _LUT_GREEN[green] +
+                          _LUT_BLUE[blue]) >> 10
+            pixel.red   = brightness
+            pixel.green = brightness
+            pixel.blue  = brightness
+
+
+def _mono_sepia(image):
+    """
+    Converts a table-backend image to sepia tone in place.
+
+    This is the specialized loop body for mono with sepia True, so the hot
+    loop carries no per-pixel branch on the mode.
+
+    Parameter image: The image buffer
+    Precondition: image is a 2d table of RGB objects
+    """
+    for row in image:
+        for pixel in row:
+            red, green, blue = _rgb(pixel)
+            brightness = (_LUT_RED[red] + _LUT_GREEN[green] +
+                          _LUT_BLUE[blue]) >> 10
+            pixel.red   = brightness
+            pixel.green = _LUT_SEPIA_GREEN[brightness]
+            pixel.blue  = _LUT_SEPIA_BLUE[brightness]
+
+
 def mono(image, sepia=False):
     """
     Returns True after converting the image to monochrome.
@@ -126,27 +384,56 @@ def mono(image, sepia=False):
     # Enforce the precondition for sepia
     assert type(sepia) == bool
 
-    height = len(image)
-    width = len(image[0])
-
-    for row in range(height):
-
-        for col in range(width):
-
-            pixel = image[row][col]
-            brightness = pixel.red * 0.3 + pixel.green * 0.6 + pixel.blue * 0.1
-
-            if sepia==False:
-
-                pixel.red = int(brightness)
-                pixel.green = int(brightness)
-                pixel.blue = int(brightness)
-
-            if sepia==True:
-
-                pixel.red = int(brightness)
-                pixel.green = int(0.6*brightness)
-                pixel.blue = int(0.4*brightness)
+    # Packed-byte backend: transform whole rows with the SWAR kernel
+    if hasattr(image, '_rows'):
+        for row in image._rows:
+            _mono_swar(row, sepia)
+        return True
+
+    # Vectorized path: compute the brightness of every pixel in one numpy
+    # expression instead of three multiplications per pixel in Python.
+    if np is not None:
+        # Array backend: work on the pixel array in place; the transform is
+        # per-pixel, so it commutes with any pending orientation.  Otherwise
+        # make a temporary array from the RGB objects and copy the result back.
+        native = hasattr(image, '_arr')
+        arr = image._arr if native else _to_ndarray(image)
+        xp  = getattr(image, '_xp', np)
+
+        if _mono_kernel is not None and xp is np:
+            # Compiled path: extract contiguous channel planes and run the
+            # parallel kernel over them.
+            red   = np.ascontiguousarray(arr[..., 0])
+            green = np.ascontiguousarray(arr[..., 1])
+            blue  = np.ascontiguousarray(arr[..., 2])
+            _mono_kernel(red, green, blue, sepia)
+            arr[..., 0] = red
+            arr[..., 1] = green
+            arr[..., 2] = blue
+        else:
+            # Widening multiply-add path.  Rows are independent, so on big
+            # host-memory images the stripes are handed to a thread pool;
+            # the GPU backend is already parallel and skips the pool.
+            height = arr.shape[0]
+            workers = min(os.cpu_count() or 1, height)
+            if (xp is np and workers > 1 and
+                    height*arr.shape[1] > _PARALLEL_THRESHOLD):
+                stripes = [arr[i*height//workers:(i+1)*height//workers]
+                           for i in range(workers)]
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    list(pool.map(lambda s: _mono_stripe(s, sepia), stripes))
+            else:
+                _mono_stripe(arr, sepia)
+
+        if not native:
+            _from_ndarray(image, arr)
+        return True
+
+    # Dispatch once on the mode instead of branching inside the pixel loop
+    if sepia:
+        _mono_sepia(image)
+    else:
+        _mono_grey(image)
 
     # Change this to return True when the function is implemented
     #return False
@@ -170,17 +457,30 @@ def flip(image,vertical=False):
     # Enforce the precondition for vertical
     assert type(vertical) == bool
 
-    height = len(image)
-    width = len(image[0])
+    # Array backend: record the flip in the orientation descriptor.  No
+    # pixels move until the next access materializes the orientation.
+    if hasattr(image, '_orient'):
+        image.flip(vertical)
+        return True
+
+    # Packed-byte backend: a vertical flip swaps row references, and a
+    # horizontal flip reverses each row as uint32 pixels in one C-level copy
+    if hasattr(image, '_rows'):
+        if vertical:
+            image._rows.reverse()
+        else:
+            for row in image._rows:
+                row[:] = memoryview(row).cast('I')[::-1].tobytes()
+        return True
 
     # Horizontal Flip
     if vertical == False:
-        for col in range(height):
-            image[col].reverse()
+        for row in image:
+            row[:] = row[::-1]
 
     # Vertical Flip
     if vertical == True:
-        image.reverse()
+        image[:] = image[::-1]
 
     # Change this to return True when the function is implemented
     return True
@@ -204,39 +504,115 @@ def transpose(image):
     Precondition: image is a 2d table of RGB objects
     """
 
+    # Array backend: record the transpose in the orientation descriptor.  No
+    # pixels move until the next access materializes the orientation.
+    if hasattr(image, '_orient'):
+        image.transpose()
+        return True
+
+    # Packed-byte backend: gather each output row with four strided slice
+    # copies (one per RGBA byte) over the flattened image, so the pixel
+    # scatter runs in C instead of one Python move per pixel
+    if hasattr(image, '_rows'):
+        numrows = len(image._rows)
+        numcols = len(image._rows[0])//4
+        flat   = b''.join(image._rows)
+        stride = 4*numcols
+
+        result = []
+        for co in range(numcols):
+            row = bytearray(4*numrows)
+            for k in range(4):
+                row[k::4] = flat[4*co+k::stride]
+            result.append(row)
+
+        image._rows = result
+        return True
+
     # To loop through rows
     numrows = len(image)
 
     # To loop through columns
     numcols = len(image[0])
 
-    # Accumulator variable for rotated copy of image
-    result = []
+    # Pre-allocate the transposed copy so no append() resizing occurs
+    result = [[None]*numrows for _ in range(numcols)]
+
+    # Copy tile by tile.  Each TILE x TILE block of pixels is touched while
+    # its rows are still cached, instead of striding through every row list
+    # once per output column.
+    TILE = 64
+    for bi in range(0, numrows, TILE):
+        rowend = min(bi+TILE, numrows)
+        for bj in range(0, numcols, TILE):
+            colend = min(bj+TILE, numcols)
+            for ro in range(bi, rowend):
+                line = image[ro]
+                for co in range(bj, colend):
+                    result[co][ro] = line[co]
+
+    # Replace the rows of image in one slice assignment
+    image[:] = result
 
-    # For-loop to iterate through columns
-    for co in range(numcols):
+    # Change this to return True when the function is implemented
+    #return False
+    return True
 
-        row = []
+def _rotate_left_tiled(image):
+    """
+    Rotates a table-backend image left 90 degrees in a single tiled pass.
 
-        # For-loop to iterate through rows
-        for ro in range(numrows):
+    This fuses the transpose and the row reversal into one copy, halving the
+    number of passes over the pixels.  The tiling matches transpose.
 
-            row.append(image[ro][co])
+    Parameter image: The image buffer
+    Precondition: image is a 2d table of RGB objects
+    """
+    numrows = len(image)
+    numcols = len(image[0])
 
-        result.append(row)
+    result = [[None]*numrows for _ in range(numcols)]
 
-    # Clear image
-    image.clear()
+    TILE = 64
+    for bi in range(0, numrows, TILE):
+        rowend = min(bi+TILE, numrows)
+        for bj in range(0, numcols, TILE):
+            colend = min(bj+TILE, numcols)
+            for ro in range(bi, rowend):
+                line = image[ro]
+                for co in range(bj, colend):
+                    result[numcols-1-co][ro] = line[co]
 
-    # Loop through row of result
-    for row in result:
+    image[:] = result
 
-        # Append row to image
-        image.append(row)
 
-    # Change this to return True when the function is implemented
-    #return False
-    return True
+def _rotate_right_tiled(image):
+    """
+    Rotates a table-backend image right 90 degrees in a single tiled pass.
+
+    This fuses the row reversal and the transpose into one copy, halving the
+    number of passes over the pixels.  The tiling matches transpose.
+
+    Parameter image: The image buffer
+    Precondition: image is a 2d table of RGB objects
+    """
+    numrows = len(image)
+    numcols = len(image[0])
+
+    result = [[None]*numrows for _ in range(numcols)]
+
+    TILE = 64
+    for bi in range(0, numrows, TILE):
+        rowend = min(bi+TILE, numrows)
+        for bj in range(0, numcols, TILE):
+            colend = min(bj+TILE, numcols)
+            for ro in range(bi, rowend):
+                line = image[ro]
+                for co in range(bj, colend):
+                    result[co][numrows-1-ro] = line[co]
+
+    image[:] = result
+
 
 def rotate(image,right=False):
     """
@@ -258,15 +634,24 @@ def rotate(image,right=False):
     # Enforce the precondition for right
     assert type(right) == bool
 
+    # Array backend: a rotation is two O(1) orientation updates.  No pixels
+    # move until the next access materializes the orientation.
+    if hasattr(image, '_orient'):
+        if right:
+            image.flip(True)
+            image.transpose()
+        else:
+            image.transpose()
+            image.flip(True)
+        return True
+
     # Rotate image left
     if right == False:
-        transpose(image)
-        image.reverse()
+        _rotate_left_tiled(image)
 
     # Rotate image right
     if right == True:
-        image.reverse()
-        transpose(image)
+        _rotate_right_tiled(image)
 
     # Change this to return True when the function is implemented
     #return False